@@ -25,28 +25,26 @@ import sys
 
 sys.path.append('/opt/py')
 
+import concurrent.futures
 import contextlib
 import datetime
-import docopt
-import errno
-import gzip
+import functools
 import json
 import loops
 import mcrcon
-import more_itertools
 import os
 import signal
 import os.path
 import pathlib
-import pwd
 import re
-import requests
+import select
 import shutil
 import socket
 import subprocess
+import tempfile
 import threading
 import time
-import urllib.parse
+from uuid import UUID
 
 try:
     from minecraft.version import __version__
@@ -57,11 +55,23 @@ from wmb import get_config, from_assets
 CONFIG = get_config("systemd-minecraft", base = from_assets(__file__))
 
 if __name__ == '__main__':
+    import docopt
     arguments = docopt.docopt(__doc__, version='Minecraft init script {}'.format(__version__))
 
-for key in CONFIG['paths']:
-    if isinstance(CONFIG['paths'][key], str):
-        CONFIG['paths'][key] = pathlib.Path(CONFIG['paths'][key])
+CONFIG['paths'] = {key: pathlib.Path(value) if isinstance(value, str) else value for key, value in CONFIG['paths'].items()}
+
+_SESSION = None # shared HTTP session, see _session
+
+# matches the log line printed by the server once it has finished starting, precompiled since it's checked against each line of startup output
+_SERVER_DONE_REGEX = re.compile(b'[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2} \\[Server thread/INFO\\]: Done \\([0-9]+\\.[0-9]+s\\)!')
+
+_VERSIONS_MANIFEST = None # (time.monotonic() of the fetch, parsed JSON), see _versions_manifest
+_VERSIONS_MANIFEST_TTL = datetime.timedelta(minutes=10)
+
+_WHITELISTED_STATUSES = frozenset({'founding', 'later', 'postfreeze'}) # people with any other status are not added to the whitelist
+
+_WHITELIST_CACHE_TTL = datetime.timedelta(days=30) # how long Mojang UUID/name lookups are reused by World.update_whitelist
+_WHITELIST_CACHE_BACK_OFF = datetime.timedelta(minutes=10) # how long expired lookups are still reused after Mojang rate limits World.update_whitelist
 
 
 class World:
@@ -72,6 +82,9 @@ class World:
             self.name = name
         else:
             raise ValueError('no such world')
+        self._rcon = None # RCON connection reused across commands, see the commands method
+        self._rcon_lock = threading.Lock()
+        self._world_path = None # cached by the world_path property
 
     def __repr__(self):
         return 'minecraft.World({!r})'.format(self.name)
@@ -85,14 +98,19 @@ class World:
         Optional arguments:
         announce -- Whether to announce in-game that saves are being disabled/reenabled. Defaults to False.
         reply -- This function is called with human-readable progress updates. Defaults to the built-in print function.
-        path -- Where the backup will be saved. The file extension .tar.gz will be appended automatically. Defaults to a file with the world name and a timestamp in the backups directory.
+        path -- Where the backup will be saved. The file extension .tar.gz or .tar.zst will be appended automatically. Defaults to a file with the world name and a timestamp in the backups directory.
 
         Keyword-only arguments:
         copy_to_latest -- Whether to create or update the copy of the world directory at backups/latest. Defaults to True for the main world and to False for all other worlds.
 
         Returns:
-        A pathlib.Path representing the gzipped backup tarball.
+        A pathlib.Path representing the compressed backup tarball. Depending on the backupCompression config option, this is either a .tar.gz or a .tar.zst file.
+
+        Raises:
+        subprocess.CalledProcessError -- If tar exits with a status of 2 or higher or the compressor fails. The incomplete tarball is deleted.
         """
+        if CONFIG['backupCompression'] not in ('gzip', 'zstd'):
+            raise ValueError('unknown backup compression: {}'.format(CONFIG['backupCompression']))
         if copy_to_latest is None:
             copy_to_latest = self.is_main
         self.save_off(announce=announce, reply=reply)
@@ -100,19 +118,56 @@ class World:
             path = str(self.backup_path / '{}_{:%Y-%m-%d_%Hh%M}'.format(self.name, datetime.datetime.utcnow()))
         else:
             path = str(path)
-        backup_file = pathlib.Path(path + '.tar')
+        if CONFIG['backupCompression'] == 'zstd':
+            compressor = ['zstd', '-T0', '-q', '--rsyncable']
+            backup_file = pathlib.Path(path + '.tar.zst')
+        else:
+            compressor = ['gzip' if shutil.which('pigz') is None else 'pigz', '--rsyncable'] # pigz is a parallel gzip with the same output format
+            backup_file = pathlib.Path(path + '.tar.gz')
+        if CONFIG['backupCompressionLevel'] is not None:
+            compressor.append('-{}'.format(CONFIG['backupCompressionLevel']))
         reply('Backing up minecraft world...')
         if not backup_file.parent.exists():
             # make sure the backup directory exists
             backup_file.parent.mkdir(parents=True)
-        subprocess.call(['tar', '-C', str(self.path), '-cf', str(backup_file), self.world_path.name]) # tar the world directory (e.g. /opt/wurstmineberg/world/wurstmineberg/world or /opt/wurstmineberg/world/wurstmineberg/wurstmineberg)
-        if copy_to_latest:
-            # make a copy of the world directory for the main world to be used by map rendering
-            subprocess.call(['rsync', '-av', '--delete', str(self.world_path) + '/', str(self.backup_path / 'latest')])
-        self.save_on(announce=announce, reply=reply)
-        reply('Compressing backup...')
-        subprocess.call(['gzip', '-f', str(backup_file)])
-        backup_file = pathlib.Path(str(backup_file) + '.gz')
+        # on copy-on-write filesystems like btrfs or xfs, take an instant reflink snapshot of the world so saves can be reenabled before compressing
+        snapshot_path = self.path / '.{}.snapshot.{}'.format(self.world_path.name, os.getpid()) # same filesystem as the world, required for reflinks
+        snapshot_path.mkdir()
+        # probe with a single file first, since on other filesystems cp would still walk the entire world and create an empty file for each file
+        if (
+            subprocess.call(['cp', '--reflink=always', str(self.world_path / 'level.dat'), str(snapshot_path / 'level.dat.probe')], stderr=subprocess.DEVNULL) == 0
+            and subprocess.call(['cp', '--reflink=always', '-a', str(self.world_path), str(snapshot_path)], stderr=subprocess.DEVNULL) == 0
+        ):
+            source_path = snapshot_path
+            self.save_on(announce=announce, reply=reply)
+        else:
+            shutil.rmtree(str(snapshot_path))
+            source_path = self.path
+        try:
+            with backup_file.open('wb') as backup_fobj:
+                # stream the tarball directly into the compressor instead of writing an uncompressed tarball to disk first
+                # --rsyncable keeps unchanged parts of the world byte-identical in the compressed output, so rsync only has to transfer the changes
+                tar_popen = subprocess.Popen(['tar', '-C', str(source_path), '-b', '1024', '-cf', '-', self.world_path.name], stdout=subprocess.PIPE) # 512 KiB records instead of the default 10 KiB to cut down on syscalls; tar the world directory (e.g. /opt/wurstmineberg/world/wurstmineberg/world or /opt/wurstmineberg/world/wurstmineberg/wurstmineberg)
+                compressor_popen = subprocess.Popen(compressor + ['-c'], stdin=tar_popen.stdout, stdout=backup_fobj)
+                tar_popen.stdout.close() # so tar gets SIGPIPE if the compressor exits early
+                compressor_returncode = compressor_popen.wait()
+                tar_returncode = tar_popen.wait()
+            if tar_returncode == 1:
+                # GNU tar exits with 1 if a file changed while it was being read, e.g. player data written on logout, but the archive is still complete
+                reply('Warning: some files changed while they were being backed up')
+            for popen, returncode in ((tar_popen, 0 if tar_returncode == 1 else tar_returncode), (compressor_popen, compressor_returncode)):
+                if returncode != 0:
+                    backup_file.unlink() # don't leave a truncated backup behind
+                    raise subprocess.CalledProcessError(returncode, popen.args)
+            if copy_to_latest:
+                # make a copy of the world directory for the main world to be used by map rendering
+                # both sides are local, so copying changed files whole is cheaper than rsync's delta algorithm
+                subprocess.call(['rsync', '-av', '--delete', '--inplace', '--whole-file', str(source_path / self.world_path.name) + '/', str(self.backup_path / 'latest')])
+        finally:
+            if source_path == snapshot_path:
+                shutil.rmtree(str(snapshot_path))
+            else:
+                self.save_on(announce=announce, reply=reply) # also reenable saves if the backup failed
         if self.is_main and CONFIG['paths']['backupWeb'] is not None:
             reply('Symlinking to httpdocs...')
             if CONFIG['paths']['backupWeb'].is_symlink():
@@ -135,6 +190,27 @@ class World:
         args -- A list of arguments passed to the command.
         block -- If True and the server is not running, tries to wait until the server is running to send the command. Defaults to False.
 
+        Raises:
+        MinecraftServerNotRunningError -- If the world is not running and block is set to False.
+        socket.error -- If the world is running but the RCON connection failed.
+        """
+        cmd += (' ' + ' '.join(str(arg) for arg in args)) if len(args) else ''
+        return self.commands([cmd], block=block)[0]
+
+    def commands(self, cmds, block=False):
+        """Send multiple commands to the server. The RCON connection is kept open and reused for later commands sent through this World object.
+
+        If a reused connection fails, the failed command and the remaining ones are sent again over a new connection. This is meant for connections that went stale while idle (e.g. because the server was restarted), where the command never reached the current server. If the connection breaks after the server has received a command but before it has responded, that command is run twice, so commands which must not be repeated, like say, may show up twice in rare cases.
+
+        Required arguments:
+        cmds -- A list of commands, each including its arguments.
+
+        Optional arguments:
+        block -- If True and the server is not running, tries to wait until the server is running to send the commands. Defaults to False.
+
+        Returns:
+        A list of the server's responses, in the same order as the commands.
+
         Raises:
         MinecraftServerNotRunningError -- If the world is not running and block is set to False.
         socket.error -- If the world is running but the RCON connection failed.
@@ -145,13 +221,33 @@ class World:
             else:
                 raise MinecraftServerNotRunningError('')
 
-        cmd += (' ' + ' '.join(str(arg) for arg in args)) if len(args) else ''
-
-        rcon = mcrcon.MCRcon()
-        rcon.connect('localhost', self.config['rconPort'], self.config['rconPassword'])
-        return rcon.command(cmd)
+        with self._rcon_lock:
+            responses = []
+            fresh_connection = False
+            while len(responses) < len(cmds):
+                if self._rcon is None:
+                    config = self.config
+                    rcon = mcrcon.MCRcon()
+                    rcon.connect('localhost', config['rconPort'], config['rconPassword'])
+                    self._rcon = rcon
+                    fresh_connection = True
+                try:
+                    responses.append(self._rcon.command(cmds[len(responses)]))
+                except socket.error:
+                    with contextlib.suppress(socket.error):
+                        self._rcon.disconnect() # close the broken socket instead of leaking it until garbage collection
+                    self._rcon = None
+                    if fresh_connection:
+                        raise
+                    # the reused connection has gone stale (e.g. because the server was restarted), so retry once with a new one
+            return responses
 
     def cleanup(self, reply=print):
+        with self._rcon_lock:
+            if self._rcon is not None:
+                with contextlib.suppress(socket.error):
+                    self._rcon.disconnect()
+                self._rcon = None
         if self.pidfile_path.exists():
             reply("Removing PID file...")
             self.pidfile_path.unlink()
@@ -161,16 +257,17 @@ class World:
 
     @property
     def config(self):
+        world_config = CONFIG['worlds'][self.name]
         ret = {
-            'customServer': CONFIG['worlds'][self.name].get('customServer', False),
-            'enabled': CONFIG['worlds'][self.name].get('enabled', False),
+            'customServer': world_config.get('customServer', False),
+            'enabled': world_config.get('enabled', False),
             'javaOptions': CONFIG['javaOptions'].copy(),
-            'rconPassword': CONFIG['worlds'][self.name].get('rconPassword'),
-            'rconPort': CONFIG['worlds'][self.name].get('rconPort', 25575),
+            'rconPassword': world_config.get('rconPassword'),
+            'rconPort': world_config.get('rconPort', 25575),
             'whitelist': CONFIG['whitelist'].copy()
         }
-        ret['javaOptions'].update(CONFIG['worlds'][self.name].get('javaOptions', {}))
-        ret['whitelist'].update(CONFIG['worlds'][self.name].get('whitelist', {}))
+        ret['javaOptions'].update(world_config.get('javaOptions', {}))
+        ret['whitelist'].update(world_config.get('whitelist', {}))
         return ret
 
     @property
@@ -191,7 +288,7 @@ class World:
         reply -- This function is called several times with a string argument representing update progress. Defaults to the built-in print function.
         """
         # get version
-        versions_json = requests.get('https://launchermeta.mojang.com/mc/game/version_manifest.json').json()
+        versions_json = _versions_manifest()
         if version is None: # try to dynamically get the latest version number from assets
             version = versions_json['latest']['snapshot' if snapshot else 'release']
         elif snapshot:
@@ -213,29 +310,36 @@ class World:
         if override is None:
             override = version == old_version
         if version_dict is not None and 'url' in version_dict:
-            version_json = requests.get(version_dict['url']).json()
+            version_json = _session().get(version_dict['url'], timeout=10).json()
         else:
             version_json = None
         # back up world in background
         if make_backup:
             backup_path = self.backup_path / 'pre-update' / '{}_{:%Y-%m-%d_%Hh%M}_{}_{}'.format(self.name, datetime.datetime.utcnow(), old_version, version)
-            backup_thread = threading.Thread(target=self.backup, kwargs={'reply': reply, 'path': backup_path})
-            backup_thread.start()
+            backup_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            backup_future = backup_executor.submit(self.backup, reply=reply, path=backup_path)
+            backup_executor.shutdown(wait=False) # the worker thread exits on its own once the backup is done
         # get server jar
+        downloads = [] # (url, local path) pairs
         jar_path = CONFIG['paths']['jar'] / 'minecraft_server.{}.jar'.format(version)
         if override and jar_path.exists():
             jar_path.unlink()
         if not jar_path.exists():
-            _download('https://s3.amazonaws.com/Minecraft.Download/versions/{0}/minecraft_server.{0}.jar'.format(version), local_filename=str(jar_path))
+            downloads.append(('https://s3.amazonaws.com/Minecraft.Download/versions/{0}/minecraft_server.{0}.jar'.format(version), jar_path))
         # get client jar
         if 'clientVersions' in CONFIG['paths']:
-            with contextlib.suppress(FileExistsError):
-                (CONFIG['paths']['clientVersions'] / version).mkdir(parents=True)
-            _download('https://s3.amazonaws.com/Minecraft.Download/versions/{0}/{0}.jar'.format(version) if version_json is None else version_json['downloads']['client']['url'], local_filename=str(CONFIG['paths']['clientVersions'] / version / '{}.jar'.format(version)))
+            version_client_jar_path = CONFIG['paths']['clientVersions'] / version / '{}.jar'.format(version)
+            if override or not version_client_jar_path.exists(): # like the server jar, only download if missing since the jar for a given version never changes
+                with contextlib.suppress(FileExistsError):
+                    version_client_jar_path.parent.mkdir(parents=True)
+                downloads.append(('https://s3.amazonaws.com/Minecraft.Download/versions/{0}/{0}.jar'.format(version) if version_json is None else version_json['downloads']['client']['url'], version_client_jar_path))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as download_executor: # the jars are independent, so download them in parallel
+            for future in [download_executor.submit(_download, url, local_filename=str(path)) for url, path in downloads]:
+                future.result()
         # wait for backup to finish
         if make_backup:
             yield 'Download finished. Waiting for backup to finish...'
-            backup_thread.join()
+            backup_future.result() # unlike Thread.join, this reraises exceptions from the backup so we don't update without one
             yield 'Backup finished. Stopping server...'
         else:
             yield 'Download finished. Stopping server...'
@@ -272,12 +376,8 @@ class World:
         reply("World '" + self.name + "': Sending SIGTERM to PID " + str(pid) + " and waiting 60 seconds for shutdown...")
         try:
             os.kill(pid, signal.SIGTERM)
-            for _ in range(60):
-                live = self.pidrunning(pid)
-                if not live:
-                    reply("Terminated world '" + self.name + "'")
-                    break
-                time.sleep(1)
+            if self._wait_for_pid(pid, 60):
+                reply("Terminated world '" + self.name + "'")
             else:
                 reply("Could not terminate with SIGQUIT. Sending SIGKILL to PID " + str(pid) + "...")
                 os.kill(pid, signal.SIGKILL)
@@ -300,6 +400,15 @@ class World:
             return None
 
     def pidrunning(self, pid):
+        try:
+            with open('/proc/{}/stat'.format(pid), 'rb') as stat_f:
+                stat = stat_f.read()
+        except FileNotFoundError:
+            if os.path.exists('/proc/self'):
+                return False
+            # no procfs, fall back to probing with a signal
+        else:
+            return stat[stat.rindex(b')') + 2:][:1] != b'Z' # zombie processes have already terminated, they just haven't been reaped yet
         try:
             os.kill(pid, 0)
             return True
@@ -344,7 +453,7 @@ class World:
         """
         # determine version and backup path
         if path_or_version is None:
-            path = sorted((self.backup_path / 'pre-update').iterdir(), key=lambda path: path.stat().st_mtime, reverse=True)[0] # latest pre-update backup
+            path = max((self.backup_path / 'pre-update').iterdir(), key=lambda path: path.stat().st_mtime) # latest pre-update backup
             version = path.name.split('_')[3]
         elif isinstance(path_or_version, pathlib.Path):
             path = path_or_version
@@ -353,7 +462,7 @@ class World:
             version = path_or_version
             if snapshot and len(version) == 1:
                 version = datetime.datetime.utcnow().strftime('%yw%V') + version
-            path = next(path for path in sorted((self.backup_path / 'pre-update').iterdir(), key=lambda path: path.stat().st_mtime, reverse=True) if path.name.split('_')[3] == version)
+            path = max((path for path in (self.backup_path / 'pre-update').iterdir() if path.name.split('_')[3] == version), key=lambda path: path.stat().st_mtime) # latest pre-update backup from that version
         # start iter_update
         update_iterator = self.iter_update(version, log_path=log_path, make_backup=False, override=override, reply=reply)
         version_dict = next(update_iterator)
@@ -376,8 +485,13 @@ class World:
         # restore backup
         world_path = self.world_path
         if world_path.exists():
-            shutil.rmtree(str(world_path))
-        subprocess.call(['tar', '-C', str(self.path), '-xzf', str(path), world_path.name]) # untar tar the world backup
+            trash_path = world_path.with_name('{}.old.{}'.format(world_path.name, os.getpid()))
+            world_path.rename(trash_path) # moving the old world out of the way is instant, so the backup can be extracted right away
+            threading.Thread(target=shutil.rmtree, args=(str(trash_path),)).start() # not a daemon thread, so the process waits for the deletion to finish before exiting
+        if path.name.endswith('.gz') and shutil.which('pigz') is not None:
+            subprocess.call(['tar', '--use-compress-program=pigz', '-C', str(self.path), '-xf', str(path), world_path.name]) # pigz decompresses in a separate thread from reading and writing
+        else:
+            subprocess.call(['tar', '-C', str(self.path), '-xf', str(path), world_path.name]) # untar tar the world backup, tar detects the compression format
         # restart server
         if was_running:
             self.start(reply=reply, start_message='Server reverted. Restarting...', log_path=log_path)
@@ -395,9 +509,8 @@ class World:
             if announce:
                 self.say('Server backup starting. Server going readonly...')
             self.command('save-off')
-            self.command('save-all')
-            time.sleep(10)
-            os.sync()
+            self.command('save-all', ['flush']) # blocks until all chunks are written, so the RCON response means the save is complete
+            _fsync_tree(self.world_path) # only flush the filesystem containing this world instead of all filesystems using os.sync
         else:
             reply('Minecraft is not running. Not suspending saves.')
 
@@ -459,22 +572,27 @@ class World:
                             pass
                         return
 
-                    str_buffer = ''
+                    line_buffer = b''
                     try:
                         s.listen(1)
                         c, _ = s.accept()
                         while loop_var:
-                            data = c.recv(4096)
+                            data = c.recv(65536)
                             if not data:
                                 break
-                            lines = (str_buffer + data.decode('utf-8')).split('\n')
+                            # split on raw bytes so multibyte characters spanning two recv calls aren't mangled and lines don't need to be decoded and reencoded
+                            lines = (line_buffer + data).split(b'\n')
+                            commands = bytearray()
                             for line in lines[:-1]:
-                                if line == 'stop':
+                                if line == b'stop':
                                     loop_var = False
                                     break
-                                java_popen.stdin.write(line.encode('utf-8') + b'\n')
+                                commands += line + b'\n'
+                            if commands:
+                                # forward all complete lines from this recv with a single write
+                                java_popen.stdin.write(commands)
                                 java_popen.stdin.flush()
-                            str_buffer = lines[-1]
+                            line_buffer = lines[-1]
                         try:
                             c.shutdown(socket.SHUT_RDWR)
                             c.close()
@@ -491,17 +609,24 @@ class World:
             if self.socket_path.exists():
                 self.socket_path.unlink()
 
+        java_options = self.config['javaOptions']
         invocation = [
             'java',
-            '-Xmx' + str(self.config['javaOptions']['maxHeap']) + 'M',
-            '-Xms' + str(self.config['javaOptions']['minHeap']) + 'M',
-            '-XX:+UseConcMarkSweepGC',
-            '-XX:ParallelGCThreads=' + str(self.config['javaOptions']['cpuCount']),
-            '-XX:+AggressiveOpts',
+            '-Xmx' + str(java_options['maxHeap']) + 'M',
+            '-Xms' + str(java_options['minHeap']) + 'M',
+            '-XX:+UseG1GC',
+            '-XX:MaxGCPauseMillis=50',
+            '-XX:+ParallelRefProcEnabled',
+            '-XX:+AlwaysPreTouch',
+            '-XX:ParallelGCThreads=' + str(java_options['cpuCount'])
+        ]
+        if java_options['hugePages']:
+            invocation.append('-XX:+UseTransparentHugePages')
+        invocation += [
             '-Dlog4j.configurationFile=' + str(CONFIG['paths']['logConfig']),
             '-jar',
             str(CONFIG['paths']['service'])
-        ] + self.config['javaOptions']['jarOptions']
+        ] + java_options['jarOptions']
 
         reply = kwargs.get('reply', print)
         if self.status():
@@ -520,21 +645,31 @@ class World:
         with self.pidfile_path.open("w+") as pidfile:
             pidfile.write(str(java_popen.pid))
         for line in loops.timeout_total(java_popen.stdout, datetime.timedelta(seconds=CONFIG['startTimeout'])): # wait until the timeout has been exceeded...
-            if re.match('[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2} \\[Server thread/INFO\\]: Done \\([0-9]+.[0-9]+s\\)!', line.decode('utf-8')): # ...or the server has finished starting
+            if b'Done (' in line and _SERVER_DONE_REGEX.match(line): # ...or the server has finished starting (the substring check is a cheap prefilter for the regex)
                 break
         _fork(feed_commands, java_popen) # feed commands from the socket to java
-        _fork(more_itertools.consume, java_popen.stdout) # consume java stdout to prevent deadlocking
+        subprocess.Popen(['cat'], stdin=java_popen.stdout, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True) # consume java stdout to prevent deadlocking, without forking the Python interpreter
         if kwargs.get('log_path'):
             with (kwargs['log_path'].open('a') if hasattr(kwargs['log_path'], 'open') else open(kwargs['log_path'], 'a')) as logins_log:
                 ver = self.version()
                 print(datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S') + (' @restart' if ver is None else ' @start ' + ver), file=logins_log) # logs in UTC
 
         # Wait for the socket listener to spin up
-        for _ in range(20):
-            if not self.status():
-                time.sleep(0.5)
-            else:
-                break
+        try:
+            import inotify_simple
+        except ImportError:
+            for _ in range(20):
+                if not self.status():
+                    time.sleep(0.5)
+                else:
+                    break
+        else:
+            # wake up as soon as the socket file is created instead of polling
+            with inotify_simple.INotify() as inotify:
+                inotify.add_watch(str(self.socket_path.parent), inotify_simple.flags.CREATE)
+                deadline = time.monotonic() + 10
+                while not self.status() and time.monotonic() < deadline:
+                    inotify.read(timeout=max(0, int((deadline - time.monotonic()) * 1000)))
         return self.status()
 
     def status(self, reply=print):
@@ -554,16 +689,13 @@ class World:
                 self.command('save-all')
                 time.sleep(10)
                 self.command('stop')
-                time.sleep(7)
-                for _ in range(12):
-                    if self.status():
-                        time.sleep(5)
-                        continue
-                    else:
-                        break
-                else:
-                    reply('The server could not be stopped! Killing...')
-                    return self.kill()
+                # poll frequently so a quick shutdown isn't padded to the next multiple of a long sleep, but give up after the same 67 seconds as before
+                deadline = time.monotonic() + 67
+                while self.status():
+                    if time.monotonic() >= deadline:
+                        reply('The server could not be stopped! Killing...')
+                        return self.kill()
+                    time.sleep(0.5)
                 if kwargs.get('log_path'):
                     with (kwargs['log_path'].open('a') if hasattr(kwargs['log_path'], 'open') else open(kwargs['log_path'], 'a')) as logins_log:
                         print(datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S') + ' @stop', file=logins_log) # logs in UTC
@@ -622,65 +754,162 @@ class World:
         if people_file is None:
             people = people.get_people_db().obj_dump(version=3)
         else:
-            with open(str(people_file)) as people_fobj:
-                people = json.load(people_fobj)['people']
+            people = _load_people_file(str(people_file), os.stat(str(people_file)).st_mtime_ns)
         whitelist = []
-        additional = self.config['whitelist']['additional']
-        if not self.config['whitelist']['ignorePeople']:
-            for person in people:
-                if not ('minecraft' in person or 'minecraftUUID' in person):
-                    continue
-                if person.get('status', 'later') not in ['founding', 'later', 'postfreeze']:
-                    continue
+        whitelist_config = self.config['whitelist']
+        additional = whitelist_config['additional']
+        if not whitelist_config['ignorePeople']:
+            cache = _load_whitelist_cache()
+            now = time.time()
+            session = _session() # create the session before resolving people in parallel
+            import requests # already imported by _session
+
+            def back_off():
+                cache['backOffUntil'] = time.time() + _WHITELIST_CACHE_BACK_OFF.total_seconds()
+
+            def is_stale(cache_entry):
+                if cache_entry is None:
+                    return True
+                if cache.get('backOffUntil', 0) > now:
+                    return False # Mojang has recently rate limited us, so keep using existing entries for now
+                return now - cache_entry['timestamp'] > _WHITELIST_CACHE_TTL.total_seconds()
+
+            def lookup(lookups, cache_entry):
+                # returns the result and ETag from _mojang_lookup, or None if the existing cache entry should be used because Mojang is unavailable
+                try:
+                    return _mojang_lookup(lookups, etag=None if cache_entry is None else cache_entry.get('etag'))
+                except (requests.exceptions.ConnectionError, requests.exceptions.RetryError, requests.exceptions.Timeout): # still rate limited or unavailable after retrying
+                    if cache_entry is None:
+                        raise
+                    back_off()
+                    return None
+
+            def resolve(person):
+                uuid = None
                 if person.get('minecraftUUID'):
-                    uuid = person['minecraftUUID'] if isinstance(person['minecraftUUID'], str) else format(person['minecraftUUID'], 'x')
+                    with contextlib.suppress(TypeError, ValueError): # treat malformed UUIDs like missing ones, as when updating the people file
+                        uuid = _parse_uuid(person['minecraftUUID']).hex
+                if uuid is not None:
                     if 'minecraft' in person:
-                        name = person['minecraft']
-                    else:
-                        name = requests.get('https://api.mojang.com/user/profiles/{}/names'.format(uuid)).json()[-1]['name']
+                        return person['minecraft'], uuid
+                    cache_entry = cache['uuids'].get(uuid)
+                    if is_stale(cache_entry):
+                        looked_up = lookup([
+                            (url.format(uuid), lambda response_json: response_json['name'])
+                            for url in ('https://sessionserver.mojang.com/session/minecraft/profile/{}', 'https://api.minecraftservices.com/minecraft/profile/lookup/{}')
+                        ], cache_entry)
+                        if looked_up is not None:
+                            name, etag = looked_up
+                            cache_entry = {
+                                'etag': etag,
+                                'name': cache_entry['name'] if name is None else name, # None means the name hasn't changed
+                                'timestamp': now
+                            }
+                            cache['uuids'][uuid] = cache_entry
+                    return cache_entry['name'], uuid
+                elif 'minecraft' in person:
+                    cache_entry = cache['names'].get(person['minecraft'].lower())
+                    if is_stale(cache_entry):
+                        looked_up = lookup([
+                            (url.format(person['minecraft']), lambda response_json: (response_json['name'], response_json['id']))
+                            for url in ('https://api.mojang.com/users/profiles/minecraft/{}', 'https://api.minecraftservices.com/minecraft/profile/lookup/name/{}')
+                        ], cache_entry)
+                        if looked_up is not None:
+                            profile, etag = looked_up
+                            name, uuid = (cache_entry['name'], cache_entry['uuid']) if profile is None else profile # None means the profile hasn't changed
+                            cache_entry = {
+                                'etag': etag,
+                                'name': name,
+                                'timestamp': now,
+                                'uuid': uuid
+                            }
+                            cache['names'][person['minecraft'].lower()] = cache_entry
+                    return cache_entry['name'], cache_entry['uuid']
                 else:
-                    response_json = requests.get('https://api.mojang.com/users/profiles/minecraft/{}'.format(person['minecraft'])).json()
-                    uuid = response_json['id']
-                    name = response_json['name']
-                if '-' not in uuid:
-                    uuid = uuid[:8] + '-' + uuid[8:12] + '-' + uuid[12:16] + '-' + uuid[16:20] + '-' + uuid[20:]
-                whitelist.append({
-                    'name': name,
-                    'uuid': uuid
-                })
+                    return None # neither a name nor a usable UUID
+
+            whitelisted_people = [
+                person
+                for person in people
+                if ('minecraft' in person or 'minecraftUUID' in person)
+                and person.get('status', 'later') in _WHITELISTED_STATUSES
+            ]
+            # look up the UUIDs for names in batches, Mojang's bulk endpoint accepts up to 10 names per request
+            # names it doesn't return are looked up individually by resolve
+            stale_names = list({
+                person['minecraft'].lower(): person['minecraft']
+                for person in whitelisted_people
+                if not person.get('minecraftUUID') and is_stale(cache['names'].get(person['minecraft'].lower()))
+            }.values())
+            for i in range(0, len(stale_names), 10):
+                try:
+                    response = session.post('https://api.mojang.com/profiles/minecraft', json=stale_names[i:i + 10], timeout=10)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout): # unavailable
+                    back_off()
+                    break # resolve falls back to existing cache entries where possible
+                if response.status_code == 429 or response.status_code >= 500: # the session doesn't retry POST requests, so these are returned as is
+                    back_off()
+                    break # resolve falls back to existing cache entries where possible
+                if not response.ok:
+                    continue # resolve looks up the names from this batch individually
+                for profile in response.json():
+                    cache['names'][profile['name'].lower()] = {
+                        'name': profile['name'],
+                        'timestamp': now,
+                        'uuid': profile['id']
+                    }
+            with concurrent.futures.ThreadPoolExecutor(max_workers=32) as executor: # the lookups are network-bound, so do them concurrently
+                for resolved in executor.map(resolve, whitelisted_people):
+                    if resolved is None:
+                        continue
+                    name, uuid = resolved
+                    whitelist.append({
+                        'name': name,
+                        'uuid': str(_parse_uuid(uuid)) # adds the dashes if necessary
+                    })
+            _save_whitelist_cache(cache)
         # write whitelist
         whitelist_path = self.path / 'whitelist.json'
-        with whitelist_path.open('a'):
-            os.utime(str(whitelist_path), None) # touch the file
-        with whitelist_path.open('w') as whitelist_json:
-            json.dump(whitelist, whitelist_json, sort_keys=True, indent=4, separators=(',', ': '))
-        # apply changes to whitelist files
-        self.command('whitelist', ['reload'])
-        # add people with unknown UUIDs to new whitelist using the command
-        for name in additional:
-            self.command('whitelist', ['add', name])
+        tmp_whitelist_path = self.path / 'whitelist.json.tmp'
+        with tmp_whitelist_path.open('w', encoding='utf-8') as whitelist_json:
+            json.dump(whitelist, whitelist_json, ensure_ascii=False, sort_keys=True, separators=(',', ':')) # the server reformats this file itself, so write it compactly
+        os.replace(str(tmp_whitelist_path), str(whitelist_path)) # atomically replace the old whitelist so the server never sees a partially written file
+        # apply changes to whitelist files, then add people with unknown UUIDs to new whitelist using the command
+        self.commands(['whitelist reload'] + ['whitelist add {}'.format(name) for name in additional])
         # update people file
         try:
             import lazyjson
         except ImportError:
             return
-        try:
-            with whitelist_path.open() as whitelist_json:
-                whitelist = json.load(whitelist_json)
-        except ValueError:
-            return
-        people = lazyjson.File(CONFIG['paths']['people'])
+        people_file = lazyjson.File(CONFIG['paths']['people'])
+        people_data = people_file.value # read and parse the people file once instead of on each access
+        people_by_uuid = {}
+        people_by_name = {}
+        for person in people_data['people']:
+            if 'minecraftUUID' in person:
+                if person['minecraftUUID']: # like resolve, ignore empty UUIDs
+                    with contextlib.suppress(TypeError, ValueError): # leave people with malformed UUIDs alone
+                        people_by_uuid.setdefault(_parse_uuid(person['minecraftUUID']), []).append(person) # keyed by uuid.UUID so UUIDs stored as ints or without dashes still match
+            elif 'minecraft' in person:
+                people_by_name.setdefault(person['minecraft'], []).append(person)
+        changed = False
         for whitelist_entry in whitelist:
-            for person in people['people']:
-                if person.get('minecraftUUID') == whitelist_entry['uuid']:
-                    if 'minecraft' in person and person.get('minecraft') != whitelist_entry['name'] and person.get('minecraft') not in person.get('minecraft_previous', []):
-                        if 'minecraft_previous' in person:
-                            person['minecraft_previous'].append(person['minecraft'])
-                        else:
-                            person['minecraft_previous'] = [person['minecraft']]
-                    person['minecraft'] = whitelist_entry['name']
-                elif person.get('minecraft') == whitelist_entry['name'] and 'minecraftUUID' not in person:
+            for person in people_by_uuid.get(_parse_uuid(whitelist_entry['uuid']), []):
+                if person.get('minecraft') == whitelist_entry['name']:
+                    continue
+                if 'minecraft' in person and person['minecraft'] not in person.get('minecraft_previous', []):
+                    if 'minecraft_previous' in person:
+                        person['minecraft_previous'].append(person['minecraft'])
+                    else:
+                        person['minecraft_previous'] = [person['minecraft']]
+                person['minecraft'] = whitelist_entry['name']
+                changed = True
+            for person in people_by_name.get(whitelist_entry['name'], []):
+                if 'minecraftUUID' not in person:
                     person['minecraftUUID'] = whitelist_entry['uuid']
+                    changed = True
+        if changed:
+            people_file.value = people_data # write the people file once with all changes
 
     def version(self):
         """Returns the version of Minecraft the world is currently configured to run. For worlds with custom servers, returns None instead.
@@ -689,33 +918,189 @@ class World:
             return None
         return self.service_path.resolve().stem[len('minecraft_server.'):]
 
+    def _wait_for_pid(self, pid, timeout):
+        """Waits up to timeout seconds for the process with the given PID to exit. Returns True if it exited, False if the timeout was reached."""
+        try:
+            pidfd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except (AttributeError, OSError):
+            # os.pidfd_open requires Python 3.9 and Linux 5.3, fall back to polling
+            for _ in range(timeout):
+                if not self.pidrunning(pid):
+                    return True
+                time.sleep(1)
+            return False
+        try:
+            # the pidfd becomes readable as soon as the process exits
+            return len(select.select([pidfd], [], [], timeout)[0]) > 0
+        finally:
+            os.close(pidfd)
+
     @property
     def world_path(self):
         """Returns the world save directory"""
-        result = self.path / 'world'
-        if not result.exists():
-            return self.path / self.name
-        return result
+        if self._world_path is None:
+            result = self.path / 'world'
+            if not result.exists():
+                result = self.path / self.name
+                if not result.exists():
+                    return result # the server may still create either directory, so don't cache this
+            self._world_path = result # the world directory doesn't move, so only check once
+        return self._world_path
 
 class MinecraftServerNotRunningError(Exception):
     pass
 
-def _command_output(cmd, args=[]):
-    p = subprocess.Popen([cmd] + args, stdout=subprocess.PIPE)
-    out, _ = p.communicate()
+def _command_output(cmd, args=()):
+    p = subprocess.Popen((cmd,) + tuple(args), stdout=subprocess.PIPE)
+    with p.stdout:
+        out = p.stdout.read() # only stdout is piped, so communicate's selector loop isn't needed
+    p.wait()
     return out.decode('utf-8')
 
+def _session():
+    """Returns a requests.Session shared by all HTTP requests, so that repeated requests to the same host (e.g. Mojang API lookups) reuse connections.
+
+    The session is created on first use, so that subcommands which don't make any HTTP requests don't pay for importing requests.
+    """
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        import urllib3.util.retry
+        session = requests.Session()
+        session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=urllib3.util.retry.Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])))
+        _SESSION = session
+    return _SESSION
+
+def _versions_manifest():
+    """Returns Mojang's version manifest. The parsed manifest is reused for 10 minutes, so that e.g. update-all only fetches it once instead of once per world.
+
+    The manifest is also cached on disk along with its ETag, so it is only downloaded again if it has changed since the last update.
+    """
+    global _VERSIONS_MANIFEST
+    if _VERSIONS_MANIFEST is None or time.monotonic() - _VERSIONS_MANIFEST[0] > _VERSIONS_MANIFEST_TTL.total_seconds():
+        cache_path = CONFIG['paths']['jar'] / '.version_manifest.json'
+        try:
+            with cache_path.open() as cache_f:
+                cache = json.load(cache_f)
+        except (FileNotFoundError, ValueError):
+            cache = None
+        headers = {} if cache is None else {'If-None-Match': cache['etag']}
+        response = _session().get('https://launchermeta.mojang.com/mc/game/version_manifest.json', headers=headers, timeout=10)
+        if cache is not None and response.status_code == 304:
+            manifest = cache['manifest']
+        else:
+            response.raise_for_status()
+            manifest = response.json()
+            if 'ETag' in response.headers:
+                with contextlib.suppress(OSError): # the cache is only an optimization
+                    with cache_path.open('w') as cache_f:
+                        json.dump({'etag': response.headers['ETag'], 'manifest': manifest}, cache_f, separators=(',', ':'))
+        _VERSIONS_MANIFEST = time.monotonic(), manifest
+    return _VERSIONS_MANIFEST[1]
+
 def _download(url, local_filename=None): #FROM http://stackoverflow.com/a/16696317/667338
     if local_filename is None:
         local_filename = url.split('#')[0].split('?')[0].split('/')[-1]
         if local_filename == '':
             raise ValueError('no local filename specified')
-    r = requests.get(url, stream=True)
-    with open(local_filename, 'wb') as f:
-        for chunk in r.iter_content(chunk_size=1024):
-            if chunk: # filter out keep-alive new chunks
-                f.write(chunk)
-        f.flush()
+    with _session().get(url, stream=True, timeout=10) as r:
+        r.raise_for_status()
+        r.raw.decode_content = True # undo any Content-Encoding, like iter_content would
+        # download to a temporary file in the same directory and move it into place when done, so an interrupted download doesn't leave a truncated file behind
+        fd, tmp_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(local_filename)), prefix='.' + os.path.basename(local_filename) + '.', suffix='.part')
+        try:
+            with open(fd, 'wb') as f:
+                shutil.copyfileobj(r.raw, f, 1024 * 1024) # copy in 1 MiB blocks
+            os.chmod(tmp_filename, 0o644)
+            os.replace(tmp_filename, local_filename)
+        except:
+            os.unlink(tmp_filename)
+            raise
+
+def _fsync_tree(path):
+    """Flushes all files and directories within the given directory to disk.
+
+    Uses a single syncfs(2) call on the filesystem containing the directory where available, which is much cheaper than opening every region file. Falls back to fsyncing each file and directory individually.
+    """
+    try:
+        import ctypes
+        syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+    except (ImportError, OSError, AttributeError):
+        pass # no syncfs on this platform
+    else:
+        fd = os.open(str(path), os.O_RDONLY)
+        try:
+            if syncfs(fd) == 0:
+                return
+        finally:
+            os.close(fd)
+    for dirpath, dirnames, filenames in os.walk(str(path)):
+        for name in filenames + ['.']:
+            try:
+                fd = os.open(os.path.join(dirpath, name), os.O_RDONLY)
+            except OSError:
+                continue # file was deleted in the meantime or is not readable
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+@functools.lru_cache(maxsize=1)
+def _load_people_file(path, mtime_ns):
+    """Returns the list of people from the given people file. The mtime is part of the cache key, so the file is only parsed again once it changes, e.g. when updating the whitelists of several worlds."""
+    with open(path) as people_fobj:
+        return json.load(people_fobj)['people']
+
+def _load_whitelist_cache():
+    try:
+        with CONFIG['paths']['whitelistCache'].open() as cache_f:
+            return json.load(cache_f)
+    except (FileNotFoundError, ValueError):
+        return {'names': {}, 'uuids': {}}
+
+def _save_whitelist_cache(cache):
+    with contextlib.suppress(FileExistsError):
+        CONFIG['paths']['whitelistCache'].parent.mkdir(parents=True)
+    tmp_cache_path = CONFIG['paths']['whitelistCache'].with_name(CONFIG['paths']['whitelistCache'].name + '.tmp')
+    with tmp_cache_path.open('w') as cache_f:
+        json.dump(cache, cache_f, sort_keys=True, indent=4, separators=(',', ': '))
+    os.replace(str(tmp_cache_path), str(CONFIG['paths']['whitelistCache'])) # a truncated cache would be treated as empty and cause a lookup for every person
+
+def _parse_uuid(value):
+    """Returns a uuid.UUID for a Minecraft UUID given as an int, or as a str with or without dashes."""
+    if isinstance(value, int):
+        return UUID(int=value)
+    return UUID(value)
+
+def _mojang_lookup(lookups, etag=None):
+    """Returns the result of the first of the given Mojang API lookups that succeeds.
+
+    Required arguments:
+    lookups -- A list of (url, func) pairs. Each URL is tried in order until one doesn't fail due to rate limiting, a server error, or a network problem, and func is called with its parsed JSON response. This keeps lookups working while one of Mojang's API hosts is rate limiting us or down, since each host has its own rate limit.
+
+    Optional arguments:
+    etag -- The ETag of a previous response to this lookup. If given, it is sent as If-None-Match, so the response can be a bodyless 304 Not Modified.
+
+    Returns:
+    A tuple of the result of func, or None if the response was 304 Not Modified, and the response's ETag, or None if it didn't have one.
+
+    Raises:
+    requests.exceptions.RequestException -- If the last lookup fails.
+    """
+    import requests # already imported by _session
+    headers = {} if etag is None else {'If-None-Match': etag}
+    for i, (url, func) in enumerate(lookups):
+        try:
+            response = _session().get(url, headers=headers, timeout=10)
+            if etag is not None and response.status_code == 304:
+                return None, etag
+            response.raise_for_status()
+            return func(response.json()), response.headers.get('ETag')
+        except (requests.exceptions.ConnectionError, requests.exceptions.RetryError, requests.exceptions.Timeout):
+            if i == len(lookups) - 1:
+                raise
 
 def _fork(func, *args, **kwargs):
     #FROM http://stackoverflow.com/a/6011298/667338
@@ -738,57 +1123,77 @@ def _fork(func, *args, **kwargs):
     except OSError as e:
         print('fork #2 failed: %d (%s)' % (e.errno, e.strerror), file=sys.stderr)
         sys.exit(1)
-    with open(os.path.devnull) as devnull:
+    with open(os.path.devnull, 'r+') as devnull:
         sys.stdin = devnull
         sys.stdout = devnull
         func(*args, **kwargs) # do stuff
         os._exit(os.EX_OK) # all done
 
-def worlds():
-    """Iterates over all configured worlds."""
-    for world_name in CONFIG['worlds'].keys():
+def _map_worlds(func, worlds):
+    """Calls func on each of the given worlds in parallel threads and returns a list of (world, result) pairs in the original order."""
+    worlds = list(worlds)
+    if len(worlds) == 0:
+        return []
+    if len(worlds) == 1:
+        # no need for a thread pool
+        return [(worlds[0], func(worlds[0]))]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(worlds))) as executor:
+        return list(zip(worlds, executor.map(func, worlds)))
+
+def worlds(enabled_only=False):
+    """Iterates over all configured worlds.
+
+    Optional arguments:
+    enabled_only -- If true, only enabled worlds are included. Disabled worlds are skipped before a World is created for them. Defaults to False.
+    """
+    for world_name, world_config in CONFIG['worlds'].items():
+        if enabled_only and not world_config.get('enabled', False): # same default as World.config, without building the full config of each world
+            continue
         yield World(world_name)
 
 if __name__ == '__main__':
+    import pwd
+    expect_user = CONFIG["runUser"]
     try:
-        expect_user = CONFIG["runUser"]
-        wurstmineberg_user = pwd.getpwnam(expect_user)
-    except:
-        sys.exit('[!!!!] User ‘{}’ does not exist!'.format(expect_user))
-    if os.geteuid() != wurstmineberg_user.pw_uid:
+        current_user = pwd.getpwuid(os.geteuid()).pw_name
+    except KeyError:
+        current_user = None
+    if current_user != expect_user:
+        # only look up the expected user to give a more specific error message
+        try:
+            pwd.getpwnam(expect_user)
+        except KeyError:
+            sys.exit('[!!!!] User ‘{}’ does not exist!'.format(expect_user))
         sys.exit('[!!!!] Only the user ‘{}’ may use this program!'.format(expect_user))
     if arguments['--all'] or arguments['update-all']:
         selected_worlds = worlds()
     elif arguments['--enabled']:
-        selected_worlds = filter(lambda world: world.config['enabled'], worlds())
+        selected_worlds = worlds(enabled_only=True)
     elif arguments['<world>']:
         selected_worlds = (World(world_name) for world_name in arguments['<world>'])
     else:
         selected_worlds = [World()]
     if arguments['kill']:
-        for world in selected_worlds:
-            if world.pidstatus():
-                world.kill()
-            else:
-                sys.exit('[WARN] Could not kill the "{}" world, PID file does not exist.'.format(world))
+        selected_worlds = list(selected_worlds)
+        missing = [world for world in selected_worlds if not world.pidstatus()]
+        _map_worlds(World.kill, [world for world in selected_worlds if world not in missing]) # killing waits up to a minute per world, so kill them all at once
+        if missing:
+            sys.exit('[WARN] Could not kill the {} world{}, PID file does not exist.'.format(', '.join('"{}"'.format(world) for world in missing), 's' if len(missing) > 1 else ''))
     elif arguments['start']:
-        for world in selected_worlds:
-            if not world.start():
-                sys.exit('[FAIL] Error! Could not start the {} world.'.format(world))
-        else:
-            print('[ ok ] Minecraft is now running.')
+        failed = [world for world in selected_worlds if not world.start()] # keep starting the remaining worlds if one fails
+        if failed:
+            sys.exit('[FAIL] Error! Could not start the {} world{}.'.format(', '.join(str(world) for world in failed), 's' if len(failed) > 1 else ''))
+        print('[ ok ] Minecraft is now running.')
     elif arguments['stop']:
-        for world in selected_worlds:
-            if not world.stop():
-                sys.exit('[FAIL] Error! Could not stop the {} world.'.format(world))
-        else:
-            print('[ ok ] Minecraft is stopped.')
+        failed = [world for world, stopped in _map_worlds(World.stop, selected_worlds) if not stopped] # stopping takes at least 17 seconds per world, so stop them all at once
+        if failed:
+            sys.exit('[FAIL] Error! Could not stop the {} world{}.'.format(', '.join(str(world) for world in failed), 's' if len(failed) > 1 else ''))
+        print('[ ok ] Minecraft is stopped.')
     elif arguments['restart']:
-        for world in selected_worlds:
-            if not world.restart():
-                sys.exit('[FAIL] Error! Could not restart the {} world.'.format(world))
-        else:
-            print('[ ok ] Minecraft is now running.')
+        failed = [world for world in selected_worlds if not world.restart()] # keep restarting the remaining worlds if one fails
+        if failed:
+            sys.exit('[FAIL] Error! Could not restart the {} world{}.'.format(', '.join(str(world) for world in failed), 's' if len(failed) > 1 else ''))
+        print('[ ok ] Minecraft is now running.')
     elif arguments['update'] or arguments['update-all']:
         for world in selected_worlds:
             if arguments['snapshot']:
@@ -806,20 +1211,22 @@ if __name__ == '__main__':
             else:
                 world.revert()
     elif arguments['backup']:
-        for world in selected_worlds:
-            world.backup()
+        _map_worlds(World.backup, selected_worlds) # each backup spends most of its time waiting for the server and the disk, so back up all worlds at once
     elif arguments['status']:
         exit1 = False
+        status_lines = [] # printed all at once at the end
         for world in selected_worlds:
-            mcversion = "" if world.version() == "" else "(Minecraft {}) ".format(world.version())
+            version = world.version()
+            mcversion = "" if not version else "(Minecraft {}) ".format(version)
             if world.status():
-                print('[info] The "{}" world {}is running with PID {}.'.format(world, mcversion, world.pid))
+                status_lines.append('[info] The "{}" world {}is running with PID {}.\n'.format(world, mcversion, world.pid))
             else:
                 exit1 = True
                 if world.pidstatus():
-                    print('[info] The "{}" world is running but the socket file does not exist. Please kill the world and restart.'.format(world))
+                    status_lines.append('[info] The "{}" world is running but the socket file does not exist. Please kill the world and restart.\n'.format(world))
                 else:
-                    print('[info] The "{}" world {}is not running.'.format(world, mcversion))
+                    status_lines.append('[info] The "{}" world {}is not running.\n'.format(world, mcversion))
+        sys.stdout.write(''.join(status_lines))
         if exit1:
             sys.exit(1)
     elif arguments['command']:
@@ -828,8 +1235,8 @@ if __name__ == '__main__':
             if len(selected_worlds) > 1:
                 print('[info] running command on {} world'.format(world))
             cmdlog = world.command(arguments['<command>'][0], arguments['<command>'][1:])
-            for line in cmdlog.splitlines():
-                print(str(line))
+            if cmdlog:
+                sys.stdout.write(cmdlog if cmdlog.endswith('\n') else cmdlog + '\n')
     elif arguments['saves']:
         for world in selected_worlds:
             if arguments['on']:
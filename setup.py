@@ -19,7 +19,6 @@ setuptools.setup(
         'docopt',
         'loops',
         'mcrcon',
-        'more-itertools',
         'requests',
     ],
     dependency_links=[